@@ -8,11 +8,11 @@ import os
 import csv
 import time
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
-import json
+import orjson
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 # Model imports
 try:
@@ -23,6 +23,12 @@ except ImportError as e:
     predict_classification = None
     predict_segment = None
 
+def count_log_rows(log_path):
+    """Count the rows read_csv would parse: lines holding anything but whitespace"""
+    # Universal newlines split on \r, \n and \r\n like the C parser; latin-1 decodes any byte
+    with open(log_path, encoding="latin-1", newline=None) as f:
+        return sum(1 for line in f if line.strip(" \t\n"))
+
 class BenchmarkAnalyzer:
     def __init__(self):
         self.sessions_path = Path("/workspaces/reCAPTCHAv2-solver/Sessions")
@@ -42,41 +48,46 @@ class BenchmarkAnalyzer:
             "total": 0,
             "solved": 0,
             "failed": 0,
-            "times": [],
             "errors": []
         })
         
-        # Iterate through all session directories
-        for session_dir in sorted(self.sessions_path.glob("**/")):
-            if session_dir.is_dir() and any(session_dir.glob("*.csv")):
-                session_name = session_dir.relative_to(self.sessions_path)
-                
-                # Process all CSV files in the session
-                csv_files = list(session_dir.glob("*.csv"))
-                for csv_file in sorted(csv_files):
-                    self._process_log_file(str(csv_file), session_name, session_stats)
+        # Walk all session directories once, collecting their CSV files
+        log_files = []
+        for root, dirs, files in os.walk(self.sessions_path):
+            dirs.sort()
+            csv_files = [f for f in files if f.endswith(".csv")]
+            if not csv_files:
+                continue
+            
+            session_name = os.path.relpath(root, self.sessions_path)  # str key, JSON-ready
+            for csv_file in sorted(csv_files):
+                log_files.append((os.path.join(root, csv_file), session_name))
+        
+        # Count log files in parallel, then reduce into the session stats
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for session_name, rows, error in executor.map(lambda f: self._process_log_file(*f), log_files):
+                if error is not None:
+                    session_stats[session_name]["errors"].append(error)
+                    continue
+                session_stats[session_name]["total"] += rows
+                session_stats[session_name]["solved"] += rows
         
         # Print summary statistics
         self._print_session_summary(session_stats)
-        self.results["session_analysis"] = {str(k): v for k, v in session_stats.items()}
+        self.results["session_analysis"] = dict(session_stats)
         
         return session_stats
     
-    def _process_log_file(self, log_path, session_name, session_stats):
-        """Process individual log file"""
+    def _process_log_file(self, log_path, session_name):
+        """Process individual log file, returning (session_name, rows, error)"""
         try:
-            df = pd.read_csv(log_path, header=None)
-            
             # Each row represents a solved CAPTCHA attempt
-            for _, row in df.iterrows():
-                session_stats[session_name]["total"] += 1
-                session_stats[session_name]["solved"] += 1
-                
-                # Log format: timestamp, type, category
-                # If all rows are successful attempts, mark them as solved
+            # Log format: timestamp, type, category
+            # If all rows are successful attempts, mark them as solved
+            return session_name, count_log_rows(log_path), None
         
         except Exception as e:
-            session_stats[session_name]["errors"].append(str(e))
+            return session_name, 0, str(e)
     
     def _print_session_summary(self, session_stats):
         """Print formatted summary of session statistics"""
@@ -87,7 +98,6 @@ class BenchmarkAnalyzer:
         
         total_solved = 0
         total_attempts = 0
-        all_times = []
         
         for session_name in sorted(session_stats.keys()):
             stats = session_stats[session_name]
@@ -99,21 +109,12 @@ class BenchmarkAnalyzer:
             
             total_solved += solved
             total_attempts += total
-            all_times.extend(stats["times"])
         
         print("-" * 80)
         overall_rate = (total_solved / total_attempts * 100) if total_attempts > 0 else 0
         print(f"{'OVERALL':<30} {total_attempts:<8} {total_solved:<8} {total_attempts - total_solved:<8} {overall_rate:<11.2f}%")
-        
-        if all_times:
-            print(f"\nTiming Statistics (from logs):")
-            print(f"  Mean time: {np.mean(all_times):.3f}s")
-            print(f"  Median time: {np.median(all_times):.3f}s")
-            print(f"  Min time: {np.min(all_times):.3f}s")
-            print(f"  Max time: {np.max(all_times):.3f}s")
-            print(f"  Std dev: {np.std(all_times):.3f}s")
     
-    def benchmark_model_inference(self):
+    def benchmark_model_inference(self, warmup=3, samples=50):
         """Benchmark model inference times"""
         if predict_classification is None or predict_segment is None:
             print("\n" + "="*80)
@@ -127,67 +128,88 @@ class BenchmarkAnalyzer:
         print("="*80)
         
         # Create a dummy image for testing
+        test_image_path = None
         try:
             from PIL import Image
-            import numpy as np
+            import tempfile
+            
+            # Let cuDNN pick the fastest kernels during warmup
+            try:
+                import torch
+                torch.backends.cudnn.benchmark = True
+                torch.set_float32_matmul_precision('high')
+            except ImportError:
+                pass
             
-            # Create test image
+            # Create test image (both predictors read tiles from disk, so it is
+            # closed before use and removed once both are benchmarked)
             test_image = Image.new('RGB', (416, 416), color='red')
+            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as test_image_file:
+                test_image_path = test_image_file.name
+                test_image.save(test_image_file, format='PNG')
             
             # Benchmark Classification Model
             print("\nYOLO Classification Model Inference:")
             print("-" * 40)
-            inference_times = []
-            
-            for i in range(5):
-                start = time.time()
-                try:
-                    result = predict_classification(test_image)
-                    inference_times.append(time.time() - start)
-                except Exception as e:
-                    print(f"  Inference {i+1}: Error - {e}")
-            
-            if inference_times:
-                self.results["model_inference_times"]["classification"] = {
-                    "mean": np.mean(inference_times),
-                    "median": np.median(inference_times),
-                    "min": np.min(inference_times),
-                    "max": np.max(inference_times),
-                    "std": np.std(inference_times),
-                    "samples": len(inference_times)
-                }
-                print(f"  Mean inference time: {np.mean(inference_times)*1000:.2f}ms")
-                print(f"  Median: {np.median(inference_times)*1000:.2f}ms")
-                print(f"  Range: {np.min(inference_times)*1000:.2f}ms - {np.max(inference_times)*1000:.2f}ms")
+            self._benchmark_predictor(
+                "classification",
+                lambda: predict_classification.predict_tile(test_image_path),
+                warmup, samples
+            )
             
             # Benchmark Segmentation Model
             print("\nYOLO Segmentation Model Inference:")
             print("-" * 40)
-            inference_times = []
-            
-            for i in range(5):
-                start = time.time()
-                try:
-                    result = predict_segment(test_image)
-                    inference_times.append(time.time() - start)
-                except Exception as e:
-                    print(f"  Inference {i+1}: Error - {e}")
-            
-            if inference_times:
-                self.results["model_inference_times"]["segmentation"] = {
-                    "mean": np.mean(inference_times),
-                    "median": np.median(inference_times),
-                    "min": np.min(inference_times),
-                    "max": np.max(inference_times),
-                    "std": np.std(inference_times),
-                    "samples": len(inference_times)
-                }
-                print(f"  Mean inference time: {np.mean(inference_times)*1000:.2f}ms")
-                print(f"  Median: {np.median(inference_times)*1000:.2f}ms")
-                print(f"  Range: {np.min(inference_times)*1000:.2f}ms - {np.max(inference_times)*1000:.2f}ms")
+            self._benchmark_predictor(
+                "segmentation",
+                lambda: predict_segment.predict(0, test_image_path),
+                warmup, samples
+            )
         
         except Exception as e:
             print(f"Error benchmarking models: {e}")
+        
+        finally:
+            if test_image_path is not None:
+                os.remove(test_image_path)
+    
+    def _benchmark_predictor(self, name, predict_fn, warmup, samples):
+        """Time a predictor, reporting cold start separately from steady state"""
+        # Warmup: first call pays for lazy init / kernel autotuning
+        warmup_times = []
+        for i in range(warmup):
+            start = time.perf_counter()
+            try:
+                predict_fn()
+                warmup_times.append(time.perf_counter() - start)
+            except Exception as e:
+                print(f"  Warmup {i+1}: Error - {e}")
+        
+        inference_times = []
+        for i in range(samples):
+            start = time.perf_counter()
+            try:
+                predict_fn()
+                inference_times.append(time.perf_counter() - start)
+            except Exception as e:
+                print(f"  Inference {i+1}: Error - {e}")
+        
+        if inference_times:
+            self.results["model_inference_times"][name] = {
+                "cold_start": warmup_times[0] if warmup_times else None,
+                "warmup_mean": np.mean(warmup_times) if warmup_times else None,
+                "mean": np.mean(inference_times),
+                "median": np.median(inference_times),
+                "min": np.min(inference_times),
+                "max": np.max(inference_times),
+                "std": np.std(inference_times),
+                "samples": len(inference_times)
+            }
+            if warmup_times:
+                print(f"  Cold start: {warmup_times[0]*1000:.2f}ms")
+            print(f"  Mean inference time: {np.mean(inference_times)*1000:.2f}ms")
+            print(f"  Median: {np.median(inference_times)*1000:.2f}ms")
+            print(f"  Range: {np.min(inference_times)*1000:.2f}ms - {np.max(inference_times)*1000:.2f}ms")
     
     def generate_report(self):
         """Generate comprehensive benchmark report"""
@@ -198,8 +220,8 @@ class BenchmarkAnalyzer:
         
         # Save detailed report
         report_path = Path("/workspaces/reCAPTCHAv2-solver/benchmark_report.json")
-        with open(report_path, 'w') as f:
-            json.dump(self.results, f, indent=2, default=str)
+        with open(report_path, 'wb') as f:
+            f.write(orjson.dumps(self.results, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
         print(f"\nDetailed report saved to: {report_path}")
         
         return self.results
@@ -1,32 +1,123 @@
 from flask import Flask, jsonify, request, send_from_directory
+from flask.json.provider import JSONProvider
+from flask_caching import Cache
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from models import db, User, APIToken, Transaction, Deposit, CAPTCHASolve, BitcoinAddress
+from models import db, User, APIToken, Transaction, Deposit, CAPTCHASolve, CAPTCHASolveView, BitcoinAddress
 from bitcoin_manager import MockBitcoinWalletManager
+from inference_server import MicroBatcher
 from config import config
+import atexit
 import os
 import secrets
-import string
+import uuid
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from functools import wraps
-import json
+from sqlalchemy import case, text, tuple_
+import threading
+import time
+import hashlib
+import orjson
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson (keys sorted, as Flask's default provider does)"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 config_name = os.getenv('FLASK_ENV', 'development')
 app.config.from_object(config[config_name])
 
+# Settings read on every request; bound once so hot paths skip the config lookup
+CAPTCHA_PRICE = app.config['CAPTCHA_PRICE']
+CONFIRMATION_THRESHOLD = app.config['CONFIRMATION_THRESHOLD']
+MIN_DEPOSIT = app.config['MIN_DEPOSIT']
+LAST_USED_FLUSH_INTERVAL = app.config['LAST_USED_FLUSH_INTERVAL']
+LAST_USED_FLUSH_SIZE = app.config['LAST_USED_FLUSH_SIZE']
+INFERENCE_TIMEOUT = app.config['INFERENCE_TIMEOUT']
+ADDRESS_POOL_SIZE = app.config['ADDRESS_POOL_SIZE']
+ADDRESS_POOL_REFILL_INTERVAL = app.config['ADDRESS_POOL_REFILL_INTERVAL']
+DEPOSIT_POLL_INTERVAL = app.config['DEPOSIT_POLL_INTERVAL']
+
 # Initialize extensions
 db.init_app(app)
 jwt = JWTManager(app)
 CORS(app)
+cache = Cache(app)
 limiter = Limiter(app=app, key_func=get_remote_address, default_limits=[app.config['API_RATE_LIMIT']])
 
+def current_user_id():
+    """UUID of the user identified by the request's JWT"""
+    return uuid.UUID(get_jwt_identity())
+
+def describe_error(e):
+    """Exception type and message for background loop logs, without SQL or parameters"""
+    # SQLAlchemy errors embed the full statement and its parameters; report the driver error
+    error = getattr(e, 'orig', None) or e
+    return f"{type(error).__name__}: {error}"
+
 # Initialize Bitcoin wallet manager
 bitcoin_manager = MockBitcoinWalletManager(network=app.config['BITCOIN_NETWORK'])
 
+# Deposit addresses are generated ahead of time into a pool of unassigned
+# BitcoinAddress rows (user_id NULL) so registration only has to claim one.
+_address_pool_event = threading.Event()
+
+def claim_pooled_address(user_id):
+    """Assign an unclaimed pool address to a user, generating one if the pool is empty"""
+    btc_addr = BitcoinAddress.query.filter(
+        BitcoinAddress.user_id.is_(None)
+    ).with_for_update(skip_locked=True).first()
+    
+    if btc_addr is None:
+        wallet_info = bitcoin_manager.generate_address_for_user(user_id)
+        btc_addr = BitcoinAddress(address=wallet_info['address'], public_key=wallet_info['public_key'])
+        db.session.add(btc_addr)
+    
+    btc_addr.user_id = user_id
+    return btc_addr
+
+def refill_address_pool():
+    """Top the pool of unassigned addresses back up to ADDRESS_POOL_SIZE"""
+    available = BitcoinAddress.query.filter(BitcoinAddress.user_id.is_(None)).count()
+    missing = ADDRESS_POOL_SIZE - available
+    if missing <= 0:
+        return
+    
+    for wallet_info in bitcoin_manager.generate_addresses_for_users([None] * missing):
+        if wallet_info:
+            db.session.add(BitcoinAddress(address=wallet_info['address'], public_key=wallet_info['public_key']))
+    db.session.commit()
+
+def _address_pool_refiller():
+    """Background loop refilling the address pool after claims and periodically"""
+    while True:
+        _address_pool_event.wait(ADDRESS_POOL_REFILL_INTERVAL)
+        _address_pool_event.clear()
+        try:
+            with app.app_context():
+                refill_address_pool()
+        except Exception as e:
+            print(f"Error refilling address pool: {describe_error(e)}")
+
+def start_address_pool_refiller():
+    """Start the background address pool refiller thread"""
+    threading.Thread(target=_address_pool_refiller, name='address-pool-refiller', daemon=True).start()
+
+# Not started under TESTING: the in-memory database shares one connection
+# across threads, so the refiller's commits would land in request transactions
+if not app.config['TESTING']:
+    start_address_pool_refiller()
+
 # ============================================================================
 # Authentication Routes
 # ============================================================================
@@ -50,23 +141,17 @@ def register():
     # Create new user
     user = User(username=data['username'], email=data['email'])
     user.set_password(data['password'])
-    
-    # Generate Bitcoin address
-    wallet_info = bitcoin_manager.generate_address_for_user(user.id)
-    
-    btc_addr = BitcoinAddress(
-        user_id=user.id,
-        address=wallet_info['address'],
-        public_key=wallet_info['public_key']
-    )
-    user.wallet_address = wallet_info['address']
-    
     db.session.add(user)
-    db.session.add(btc_addr)
+    db.session.flush()  # Assigns user.id
+    
+    # Claim a pre-generated Bitcoin address
+    btc_addr = claim_pooled_address(user.id)
+    user.wallet_address = btc_addr.address
     db.session.commit()
+    _address_pool_event.set()  # Top the pool back up now the claim is committed
     
     # Generate initial API token
-    token_string = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
+    token_string = secrets.token_urlsafe(24)
     api_token = APIToken(user_id=user.id, token=token_string, name='Default Token')
     db.session.add(api_token)
     db.session.commit()
@@ -75,7 +160,7 @@ def register():
         'message': 'User registered successfully',
         'user': user.to_dict(),
         'initial_api_token': token_string,
-        'wallet_address': wallet_info['address']
+        'wallet_address': btc_addr.address
     }), 201
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -95,7 +180,7 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'User account is inactive'}), 403
     
-    access_token = create_access_token(identity=user.id)
+    access_token = create_access_token(identity=str(user.id))
     
     return jsonify({
         'access_token': access_token,
@@ -110,8 +195,8 @@ def login():
 @jwt_required()
 def get_profile():
     """Get user profile"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -122,8 +207,8 @@ def get_profile():
 @jwt_required()
 def update_profile():
     """Update user profile"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -154,7 +239,7 @@ def update_profile():
 @jwt_required()
 def get_api_tokens():
     """Get user's API tokens"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     tokens = APIToken.query.filter_by(user_id=user_id).all()
     
     return jsonify({
@@ -165,14 +250,14 @@ def get_api_tokens():
 @jwt_required()
 def create_api_token():
     """Create a new API token"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
-    token_string = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
+    token_string = secrets.token_urlsafe(24)
     
     api_token = APIToken(
         user_id=user_id,
@@ -188,11 +273,11 @@ def create_api_token():
         'token_id': api_token.id
     }), 201
 
-@app.route('/api/api-tokens/<token_id>', methods=['DELETE'])
+@app.route('/api/api-tokens/<uuid:token_id>', methods=['DELETE'])
 @jwt_required()
 def delete_api_token(token_id):
     """Delete an API token"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     token = APIToken.query.filter_by(id=token_id, user_id=user_id).first()
     
     if not token:
@@ -211,19 +296,16 @@ def delete_api_token(token_id):
 @jwt_required()
 def get_wallet_address():
     """Get user's Bitcoin wallet address"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    
+    user_id = current_user_id()
     btc_addr = BitcoinAddress.query.filter_by(user_id=user_id).first()
     
     if not btc_addr:
         return jsonify({'error': 'Wallet not found'}), 404
     
-    # Get current balance
+    # Get current balance, valued in USD only here where it is shown to the user
     balance_info = bitcoin_manager.get_address_balance(btc_addr.address)
+    if balance_info:
+        balance_info['usd'] = bitcoin_manager.btc_to_usd(balance_info['btc'])
     
     return jsonify({
         'address': btc_addr.address,
@@ -236,11 +318,7 @@ def get_wallet_address():
 @jwt_required()
 def get_wallet_transactions():
     """Get deposit transactions for user's wallet"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
+    user_id = current_user_id()
     
     # Get transactions from database
     transactions = Transaction.query.filter_by(user_id=user_id).order_by(Transaction.received_at.desc()).all()
@@ -254,7 +332,7 @@ def get_wallet_transactions():
 @jwt_required()
 def get_deposit_aggregations():
     """Get aggregated deposits"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     
     deposits = Deposit.query.filter_by(user_id=user_id).order_by(Deposit.created_at.desc()).all()
     
@@ -266,32 +344,50 @@ def get_deposit_aggregations():
 @jwt_required()
 def check_for_deposits():
     """Check wallet for new deposits (admin/system endpoint)"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    row = db.session.query(User, BitcoinAddress).outerjoin(
+        BitcoinAddress, BitcoinAddress.user_id == User.id
+    ).filter(User.id == user_id).first()
     
-    if not user:
+    if not row:
         return jsonify({'error': 'User not found'}), 404
     
-    btc_addr = BitcoinAddress.query.filter_by(user_id=user_id).first()
+    user, btc_addr = row
     
     if not btc_addr:
         return jsonify({'error': 'Wallet not found'}), 404
     
     # Get transactions from blockchain
     blockchain_txs = bitcoin_manager.get_address_transactions(btc_addr.address)
+    processed_txs = record_blockchain_transactions(user, blockchain_txs, bitcoin_manager.get_btc_price())
+    db.session.commit()
     
-    processed_txs = []
-    btc_price = bitcoin_manager.get_btc_price()
+    return jsonify({
+        'message': 'Deposit check completed',
+        'new_transactions': len(processed_txs),
+        'processed': processed_txs
+    }), 200
+
+def record_blockchain_transactions(user, blockchain_txs, btc_price):
+    """Add new deposits and confirm known ones from a user's blockchain transactions
+    
+    Returns the new transactions as dicts; the caller commits.
+    """
+    new_txs = []
+    
+    # Load all known transactions in one query instead of one per blockchain tx
+    txids = [tx['txid'] for tx in blockchain_txs]
+    existing_txs = {t.txid: t for t in Transaction.query.filter(Transaction.txid.in_(txids)).all()} if txids else {}
     
     for tx in blockchain_txs:
         # Check if transaction exists in database
-        existing_tx = Transaction.query.filter_by(txid=tx['txid']).first()
+        existing_tx = existing_txs.get(tx['txid'])
         
         if not existing_tx and tx['amount_btc'] > 0:
             # Create new transaction
             amount_usd = tx['amount_btc'] * btc_price
             new_tx = Transaction(
-                user_id=user_id,
+                user_id=user.id,
                 txid=tx['txid'],
                 amount_btc=tx['amount_btc'],
                 amount_usd=amount_usd,
@@ -299,38 +395,30 @@ def check_for_deposits():
                 status='pending'
             )
             db.session.add(new_tx)
-            processed_txs.append(new_tx.to_dict())
+            new_txs.append(new_tx)
         
         elif existing_tx:
             # Update confirmation count
-            if existing_tx.confirmations < app.config['CONFIRMATION_THRESHOLD'] and tx['confirmations'] >= app.config['CONFIRMATION_THRESHOLD']:
+            if existing_tx.confirmations < CONFIRMATION_THRESHOLD and tx['confirmations'] >= CONFIRMATION_THRESHOLD:
                 existing_tx.confirmations = tx['confirmations']
                 existing_tx.status = 'confirmed'
                 existing_tx.confirmed_at = datetime.utcnow()
                 
                 # Update or create deposit aggregation
-                update_deposit_balance(user_id, existing_tx)
+                update_deposit_balance(user, existing_tx)
     
-    db.session.commit()
-    
-    return jsonify({
-        'message': 'Deposit check completed',
-        'new_transactions': len(processed_txs),
-        'processed': processed_txs
-    }), 200
+    # Flush so column defaults such as received_at are set before serializing
+    if new_txs:
+        db.session.flush()
+    return [t.to_dict() for t in new_txs]
 
-def update_deposit_balance(user_id, transaction):
+def update_deposit_balance(user, transaction):
     """Update deposit balance and credit if >= $15"""
-    user = User.query.get(user_id)
-    
-    if not user:
-        return
-    
     # Get or create current pending deposit
-    deposit = Deposit.query.filter_by(user_id=user_id, status='pending').first()
+    deposit = Deposit.query.filter_by(user_id=user.id, status='pending').first()
     
     if not deposit:
-        deposit = Deposit(user_id=user_id, status='pending')
+        deposit = Deposit(user_id=user.id, status='pending', total_btc=0.0, total_usd=0.0)
         db.session.add(deposit)
     
     deposit.total_btc += transaction.amount_btc
@@ -338,12 +426,10 @@ def update_deposit_balance(user_id, transaction):
     deposit.updated_at = datetime.utcnow()
     
     # Add to transaction list
-    existing_ids = set(deposit.transaction_ids.split(',')) if deposit.transaction_ids else set()
-    existing_ids.add(transaction.id)
-    deposit.transaction_ids = ','.join(existing_ids)
+    deposit.transactions.append(transaction)
     
     # Check if reached minimum deposit
-    if deposit.total_usd >= app.config['MIN_DEPOSIT']:
+    if deposit.total_usd >= MIN_DEPOSIT:
         # Credit the deposit
         deposit.status = 'credited'
         deposit.credited_amount = deposit.total_usd
@@ -351,13 +437,118 @@ def update_deposit_balance(user_id, transaction):
         transaction.status = 'credited'
         transaction.credited_at = datetime.utcnow()
     
-    elif deposit.total_usd < app.config['MIN_DEPOSIT'] and deposit.total_usd > 0:
+    elif deposit.total_usd < MIN_DEPOSIT and deposit.total_usd > 0:
         deposit.status = 'partial'
 
+# All assigned addresses are polled in bulk: one multiaddr request per 50
+# addresses finds those that received unseen funds, and full histories are
+# fetched (concurrently) only for them and for users awaiting confirmations.
+def poll_pending_deposits():
+    """Check every assigned deposit address for new or confirming transactions"""
+    addresses = dict(db.session.query(BitcoinAddress.user_id, BitcoinAddress.address).filter(BitcoinAddress.user_id.isnot(None)))
+    if not addresses:
+        return 0
+    
+    balances = bitcoin_manager.get_addresses_balances(list(addresses.values()))
+    recorded = dict(db.session.query(Transaction.user_id, db.func.sum(Transaction.amount_btc)).group_by(Transaction.user_id))
+    pending = {user_id for (user_id,) in db.session.query(Transaction.user_id).filter(Transaction.status == 'pending').distinct()}
+    
+    changed = [
+        user_id for user_id, address in addresses.items()
+        if user_id in pending
+        or address in balances and balances[address]['total_received'] > round((recorded.get(user_id) or 0) * 100000000)
+    ]
+    if not changed:
+        return 0
+    
+    blockchain_txs = bitcoin_manager.get_addresses_transactions([addresses[user_id] for user_id in changed])
+    btc_price = bitcoin_manager.get_btc_price()
+    new_transactions = 0
+    for user in User.query.filter(User.id.in_(changed)):
+        new_transactions += len(record_blockchain_transactions(user, blockchain_txs[addresses[user.id]], btc_price))
+    db.session.commit()
+    return new_transactions
+
+def _deposit_poller():
+    """Background loop polling deposit addresses periodically"""
+    while True:
+        time.sleep(DEPOSIT_POLL_INTERVAL)
+        try:
+            with app.app_context():
+                poll_pending_deposits()
+        except Exception as e:
+            print(f"Error polling deposits: {describe_error(e)}")
+
+def start_deposit_poller():
+    """Start the background deposit poller thread"""
+    threading.Thread(target=_deposit_poller, name='deposit-poller', daemon=True).start()
+
+# Not started under TESTING for the same reason as the address pool refiller
+if not app.config['TESTING']:
+    start_deposit_poller()
+
 # ============================================================================
 # CAPTCHA Solving API Routes
 # ============================================================================
 
+# API token last_used timestamps are buffered in memory and written in batches
+# so the authentication path does not pay for a commit on every request.
+_last_used_buffer = {}
+_last_used_lock = threading.Lock()
+_last_used_flush_event = threading.Event()
+
+def flush_last_used():
+    """Write buffered API token last_used timestamps in a single UPDATE"""
+    with _last_used_lock:
+        if not _last_used_buffer:
+            return
+        pending = dict(_last_used_buffer)
+        _last_used_buffer.clear()
+    
+    db.session.execute(
+        APIToken.__table__.update()
+        .where(APIToken.id.in_(list(pending)))
+        .values(last_used=case(pending, value=APIToken.id))
+    )
+    db.session.commit()
+
+def _flush_last_used_logged():
+    """Flush buffered last_used updates in an app context, logging failures"""
+    try:
+        with app.app_context():
+            flush_last_used()
+    except Exception as e:
+        print(f"Error flushing API token usage: {describe_error(e)}")
+
+def _last_used_flusher():
+    """Background loop flushing last_used updates periodically"""
+    while True:
+        _last_used_flush_event.wait(LAST_USED_FLUSH_INTERVAL)
+        _last_used_flush_event.clear()
+        _flush_last_used_logged()
+
+def start_last_used_flusher():
+    """Start the background last_used flusher thread"""
+    threading.Thread(target=_last_used_flusher, name='last-used-flusher', daemon=True).start()
+    # The daemon thread dies with the process; write what it has not flushed yet
+    atexit.register(_flush_last_used_logged)
+
+# Not started under TESTING for the same reason as the address pool refiller;
+# tests call flush_last_used() directly
+if not app.config['TESTING']:
+    start_last_used_flusher()
+
+def solve_captcha_batch(solve_ids):
+    """Solve a batch of CAPTCHAs in one pass (simulated until the solver is integrated)"""
+    return [f"g_response_mock_{solve_id}" for solve_id in solve_ids]
+
+# Concurrent solve requests are grouped into batches for the solver when enabled
+captcha_batcher = MicroBatcher(
+    solve_captcha_batch,
+    max_batch=app.config['INFERENCE_MAX_BATCH'],
+    max_wait_ms=app.config['INFERENCE_MAX_WAIT_MS']
+) if app.config['INFERENCE_BATCHING'] else None
+
 def verify_api_token(f):
     """Decorator to verify API token from request"""
     @wraps(f)
@@ -376,18 +567,20 @@ def verify_api_token(f):
         if not token_obj or not token_obj.is_active:
             return jsonify({'error': 'Invalid API token'}), 401
         
-        user = User.query.get(token_obj.user_id)
+        user = db.session.get(User, token_obj.user_id)
         
         if not user or not user.is_active:
             return jsonify({'error': 'User account inactive'}), 403
         
         # Check balance
-        if user.balance < app.config['CAPTCHA_PRICE']:
+        if user.balance < CAPTCHA_PRICE:
             return jsonify({'error': 'Insufficient balance. Minimum required: $0.001'}), 402
         
-        # Update last used
-        token_obj.last_used = datetime.utcnow()
-        db.session.commit()
+        # Update last used (persisted in batches by the flusher thread)
+        with _last_used_lock:
+            _last_used_buffer[token_obj.id] = datetime.utcnow()
+            if len(_last_used_buffer) >= LAST_USED_FLUSH_SIZE:
+                _last_used_flush_event.set()
         
         # Pass user and token to route
         return f(user, token_obj, *args, **kwargs)
@@ -411,7 +604,7 @@ def solve_captcha(user, token):
         website_url=data.get('website_url'),
         recaptcha_key=data.get('recaptcha_key'),
         status='pending',
-        cost=app.config['CAPTCHA_PRICE']
+        cost=CAPTCHA_PRICE
     )
     
     db.session.add(captcha_solve)
@@ -419,17 +612,28 @@ def solve_captcha(user, token):
     
     # TODO: Integrate with actual reCAPTCHA solver
     # For now, simulate solving
-    import time
     start_time = time.time()
     
-    # Simulate solving
+    # Simulate solving (batched with concurrent requests when enabled)
+    try:
+        if captcha_batcher:
+            solution = captcha_batcher.submit(captcha_solve.id).result(timeout=INFERENCE_TIMEOUT)
+        else:
+            solution = solve_captcha_batch([captcha_solve.id])[0]
+    except Exception as e:
+        captcha_solve.status = 'failed'
+        captcha_solve.error_message = str(e) or 'Solver timed out'
+        captcha_solve.completed_at = datetime.utcnow()
+        db.session.commit()
+        return jsonify({'error': 'CAPTCHA solving failed', 'captcha_solve': captcha_solve.to_dict()}), 503
+    
     captcha_solve.status = 'success'
-    captcha_solve.solution = f"g_response_mock_{captcha_solve.id}"
+    captcha_solve.solution = solution
     captcha_solve.completed_at = datetime.utcnow()
     captcha_solve.inference_time_ms = (time.time() - start_time) * 1000
     
     # Deduct cost from user balance
-    user.balance -= app.config['CAPTCHA_PRICE']
+    user.balance -= CAPTCHA_PRICE
     
     db.session.commit()
     
@@ -440,11 +644,11 @@ def solve_captcha(user, token):
         'remaining_balance': round(user.balance, 4)
     }), 200
 
-@app.route('/api/captcha/status/<captcha_id>', methods=['GET'])
+@app.route('/api/captcha/status/<uuid:captcha_id>', methods=['GET'])
 @jwt_required()
 def get_captcha_status(captcha_id):
     """Get CAPTCHA solve status"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     
     captcha_solve = CAPTCHASolve.query.filter_by(id=captcha_id, user_id=user_id).first()
     
@@ -457,23 +661,44 @@ def get_captcha_status(captcha_id):
 @jwt_required()
 def get_captcha_history():
     """Get user's CAPTCHA solving history"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 50, type=int)
+    after = request.args.get('after')
+    
+    if after:
+        try:
+            after = uuid.UUID(after)
+        except ValueError:
+            return jsonify({'error': 'Invalid after cursor'}), 400
+    
+    # Page straight off ix_captcha_user_created, selecting only the columns the
+    # history view needs. Only offset pages report the total (a separate
+    # index-only count); keyset pages skip it.
+    query = db.session.query(*CAPTCHASolveView.columns()).filter(
+        CAPTCHASolve.user_id == user_id
+    ).order_by(CAPTCHASolve.created_at.desc(), CAPTCHASolve.id.desc())
+    
+    if after:
+        # Keyset pagination: continue after the last solve the client has seen
+        cursor = db.session.query(CAPTCHASolve.created_at).filter_by(id=after, user_id=user_id).scalar_subquery()
+        query = query.filter(tuple_(CAPTCHASolve.created_at, CAPTCHASolve.id) < tuple_(cursor, after))
+    else:
+        query = query.offset((page - 1) * limit)
+    
+    captcha_solves = [CAPTCHASolveView(*row) for row in query.limit(limit)]
+    response = {
+        'captcha_solves': captcha_solves,
+        'limit': limit,
+        'next_after': captcha_solves[-1].id if len(captcha_solves) == limit else None
+    }
     
-    query = CAPTCHASolve.query.filter_by(user_id=user_id).order_by(CAPTCHASolve.created_at.desc())
-    total = query.count()
-    
-    captcha_solves = query.limit(limit).offset((page - 1) * limit).all()
+    if not after:
+        total = db.session.query(db.func.count()).filter(CAPTCHASolve.user_id == user_id).scalar()
+        response.update(total=total, page=page, total_pages=(total + limit - 1) // limit)
     
-    return jsonify({
-        'captcha_solves': [c.to_dict() for c in captcha_solves],
-        'total': total,
-        'page': page,
-        'limit': limit,
-        'total_pages': (total + limit - 1) // limit
-    }), 200
+    return jsonify(response), 200
 
 # ============================================================================
 # Dashboard & Stats Routes
@@ -483,18 +708,22 @@ def get_captcha_history():
 @jwt_required()
 def get_dashboard():
     """Get user dashboard"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    # Calculate stats
-    total_solves = CAPTCHASolve.query.filter_by(user_id=user_id).count()
-    successful_solves = CAPTCHASolve.query.filter_by(user_id=user_id, status='success').count()
-    total_spent = CAPTCHASolve.query.filter_by(user_id=user_id, status='success').with_entities(db.func.sum(CAPTCHASolve.cost)).scalar() or 0
-    
-    avg_time = db.session.query(db.func.avg(CAPTCHASolve.inference_time_ms)).filter_by(user_id=user_id, status='success').scalar()
+    # Calculate stats in a single pass over the user's solves
+    is_success = CAPTCHASolve.status == 'success'
+    total_solves, successful_solves, total_spent, avg_time = db.session.query(
+        db.func.count(),  # COUNT(*) keeps the query within ix_captcha_user_status
+        db.func.sum(case((is_success, 1), else_=0)),
+        db.func.sum(case((is_success, CAPTCHASolve.cost), else_=0)),
+        db.func.avg(case((is_success, CAPTCHASolve.inference_time_ms)))
+    ).filter(CAPTCHASolve.user_id == user_id).one()
+    successful_solves = successful_solves or 0
+    total_spent = total_spent or 0
     
     return jsonify({
         'user': user.to_dict(),
@@ -515,150 +744,250 @@ def get_dashboard():
 # Documentation Routes
 # ============================================================================
 
-@app.route('/api/docs', methods=['GET'])
-def get_api_docs():
-    """Get API documentation"""
-    docs = {
-        'title': 'CAPTCHA Solver API',
-        'version': '1.0.0',
-        'description': 'API for solving Google reCAPTCHAv2 challenges',
-        'base_url': request.base_url.rstrip('/'),
-        'endpoints': {
-            'auth': {
-                'register': {
-                    'method': 'POST',
-                    'path': '/api/auth/register',
-                    'description': 'Register a new user account',
-                    'body': {
-                        'username': 'string',
-                        'email': 'string',
-                        'password': 'string'
-                    },
-                    'response': {
-                        'user': 'User object',
-                        'initial_api_token': 'string',
-                        'wallet_address': 'string'
-                    }
+def etag_response(body, etag):
+    """Return a JSON response with a weak ETag, or 304 if the client already has it"""
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    return response
+
+# The docs payload is static apart from base_url, so it is serialized once at
+# import and the request's base URL is substituted into the cached string.
+_API_DOCS = {
+    'title': 'CAPTCHA Solver API',
+    'version': '1.0.0',
+    'description': 'API for solving Google reCAPTCHAv2 challenges',
+    'base_url': '__BASE_URL__',
+    'endpoints': {
+        'auth': {
+            'register': {
+                'method': 'POST',
+                'path': '/api/auth/register',
+                'description': 'Register a new user account',
+                'body': {
+                    'username': 'string',
+                    'email': 'string',
+                    'password': 'string'
                 },
-                'login': {
-                    'method': 'POST',
-                    'path': '/api/auth/login',
-                    'description': 'Login to existing account',
-                    'body': {
-                        'username': 'string',
-                        'password': 'string'
-                    },
-                    'response': {
-                        'access_token': 'JWT token',
-                        'user': 'User object'
-                    }
+                'response': {
+                    'user': 'User object',
+                    'initial_api_token': 'string',
+                    'wallet_address': 'string'
                 }
             },
-            'captcha': {
-                'solve': {
-                    'method': 'POST',
-                    'path': '/api/captcha/solve',
-                    'description': 'Solve a reCAPTCHA challenge',
-                    'headers': {
-                        'X-API-Token': 'Your API token'
-                    },
-                    'body': {
-                        'website_url': 'string (optional)',
-                        'recaptcha_key': 'string (optional)'
-                    },
-                    'cost': '$0.001 per challenge',
-                    'response': {
-                        'solution': 'g-response token',
-                        'remaining_balance': 'float'
-                    }
+            'login': {
+                'method': 'POST',
+                'path': '/api/auth/login',
+                'description': 'Login to existing account',
+                'body': {
+                    'username': 'string',
+                    'password': 'string'
                 },
-                'history': {
-                    'method': 'GET',
-                    'path': '/api/captcha/history',
-                    'description': 'Get CAPTCHA solving history',
-                    'headers': {
-                        'Authorization': 'Bearer {access_token}'
-                    },
-                    'query_params': {
-                        'page': 'integer (default: 1)',
-                        'limit': 'integer (default: 50)'
-                    }
+                'response': {
+                    'access_token': 'JWT token',
+                    'user': 'User object'
                 }
-            },
-            'wallet': {
-                'get_address': {
-                    'method': 'GET',
-                    'path': '/api/wallet/address',
-                    'description': 'Get your Bitcoin wallet address for deposits',
-                    'headers': {
-                        'Authorization': 'Bearer {access_token}'
-                    }
+            }
+        },
+        'captcha': {
+            'solve': {
+                'method': 'POST',
+                'path': '/api/captcha/solve',
+                'description': 'Solve a reCAPTCHA challenge',
+                'headers': {
+                    'X-API-Token': 'Your API token'
                 },
-                'transactions': {
-                    'method': 'GET',
-                    'path': '/api/wallet/transactions',
-                    'description': 'Get transaction history',
-                    'headers': {
-                        'Authorization': 'Bearer {access_token}'
-                    }
+                'body': {
+                    'website_url': 'string (optional)',
+                    'recaptcha_key': 'string (optional)'
                 },
-                'check_deposits': {
-                    'method': 'POST',
-                    'path': '/api/wallet/check-deposits',
-                    'description': 'Check for new Bitcoin deposits',
-                    'headers': {
-                        'Authorization': 'Bearer {access_token}'
-                    }
+                'cost': '$0.001 per challenge',
+                'response': {
+                    'solution': 'g-response token',
+                    'remaining_balance': 'float'
                 }
             },
-            'api_tokens': {
-                'list': {
-                    'method': 'GET',
-                    'path': '/api/api-tokens',
-                    'description': 'List all API tokens for user'
+            'history': {
+                'method': 'GET',
+                'path': '/api/captcha/history',
+                'description': 'Get CAPTCHA solving history',
+                'headers': {
+                    'Authorization': 'Bearer {access_token}'
                 },
-                'create': {
-                    'method': 'POST',
-                    'path': '/api/api-tokens',
-                    'description': 'Create new API token',
-                    'body': {
-                        'name': 'string (optional)'
-                    }
-                },
-                'delete': {
-                    'method': 'DELETE',
-                    'path': '/api/api-tokens/<token_id>',
-                    'description': 'Delete API token'
+                'query_params': {
+                    'page': 'integer (default: 1)',
+                    'limit': 'integer (default: 50)',
+                    'after': 'string (optional, id from next_after; replaces page, omits total and total_pages)'
                 }
             }
         },
-        'pricing': {
-            'per_captcha': '$0.001',
-            'minimum_deposit': '$15.00',
-            'supported_currencies': ['BTC']
+        'wallet': {
+            'get_address': {
+                'method': 'GET',
+                'path': '/api/wallet/address',
+                'description': 'Get your Bitcoin wallet address for deposits',
+                'headers': {
+                    'Authorization': 'Bearer {access_token}'
+                }
+            },
+            'transactions': {
+                'method': 'GET',
+                'path': '/api/wallet/transactions',
+                'description': 'Get transaction history',
+                'headers': {
+                    'Authorization': 'Bearer {access_token}'
+                }
+            },
+            'check_deposits': {
+                'method': 'POST',
+                'path': '/api/wallet/check-deposits',
+                'description': 'Check for new Bitcoin deposits',
+                'headers': {
+                    'Authorization': 'Bearer {access_token}'
+                }
+            }
         },
-        'deposit_info': {
-            'network': app.config['BITCOIN_NETWORK'],
-            'confirmation_required': app.config['CONFIRMATION_THRESHOLD'],
-            'min_deposit_usd': app.config['MIN_DEPOSIT']
+        'api_tokens': {
+            'list': {
+                'method': 'GET',
+                'path': '/api/api-tokens',
+                'description': 'List all API tokens for user'
+            },
+            'create': {
+                'method': 'POST',
+                'path': '/api/api-tokens',
+                'description': 'Create new API token',
+                'body': {
+                    'name': 'string (optional)'
+                }
+            },
+            'delete': {
+                'method': 'DELETE',
+                'path': '/api/api-tokens/<token_id>',
+                'description': 'Delete API token'
+            }
         }
+    },
+    'pricing': {
+        'per_captcha': '$0.001',
+        'minimum_deposit': '$15.00',
+        'supported_currencies': ['BTC']
+    },
+    'deposit_info': {
+        'network': app.config['BITCOIN_NETWORK'],
+        'confirmation_required': CONFIRMATION_THRESHOLD,
+        'min_deposit_usd': MIN_DEPOSIT
     }
+}
+_API_DOCS_TEMPLATE = orjson.dumps(_API_DOCS, option=orjson.OPT_SORT_KEYS).decode()
+
+@cache.memoize(timeout=app.config['API_DOCS_CACHE_SECONDS'])
+def _render_api_docs(base_url):
+    """Docs body and its ETag for a base URL"""
+    body = _API_DOCS_TEMPLATE.replace('__BASE_URL__', orjson.dumps(base_url).decode()[1:-1])
+    return body, hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+@app.route('/api/docs', methods=['GET'])
+def get_api_docs():
+    """Get API documentation"""
+    body, etag = _render_api_docs(request.base_url.rstrip('/'))
     
-    return jsonify(docs), 200
+    return etag_response(body, etag)
 
 # ============================================================================
 # Health Check
 # ============================================================================
 
+# Dependency probes run on a small pool so a hung dependency costs the health
+# check at most HEALTH_PROBE_TIMEOUT instead of blocking the request.
+_health_probe_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health-probe')
+_redis_client = None
+_btc_price_refresh = None  # Background price refresh started by the health check
+
+def _timed(probe):
+    """Run a probe, returning how long it took in ms"""
+    start = time.perf_counter()
+    probe()
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def run_health_probes(probes, timeout):
+    """Run dependency probes concurrently, giving them timeout seconds in total"""
+    futures = {name: _health_probe_executor.submit(_timed, probe) for name, probe in probes.items()}
+    deadline = time.monotonic() + timeout
+    
+    checks = {}
+    for name, future in futures.items():
+        try:
+            checks[name] = {'ok': True, 'latency_ms': future.result(timeout=max(deadline - time.monotonic(), 0))}
+        except FutureTimeoutError:
+            checks[name] = {'ok': False, 'error': 'timeout'}
+        except Exception as e:
+            checks[name] = {'ok': False, 'error': str(e)}
+    
+    return checks
+
+def _probe_db():
+    """Round-trip a trivial query on a pooled connection"""
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        db.session.remove()
+
+def _probe_redis():
+    """Ping the Redis instance backing the response cache"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        timeout = app.config['HEALTH_PROBE_TIMEOUT']
+        _redis_client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'], socket_timeout=timeout, socket_connect_timeout=timeout)
+    _redis_client.ping()
+
+@cache.memoize(timeout=app.config['HEALTH_CACHE_SECONDS'])
+def _render_health():
+    """Health body, its ETag and whether required dependencies are up, shared by all pollers for HEALTH_CACHE_SECONDS"""
+    probes = {'db': _probe_db}
+    if app.config['CACHE_TYPE'] == 'RedisCache':
+        probes['redis'] = _probe_redis
+    
+    checks = run_health_probes(probes, app.config['HEALTH_PROBE_TIMEOUT'])
+    healthy = all(check['ok'] for check in checks.values())
+    
+    # The price source is optional: report the last fetch without waiting on one,
+    # and let a failing one degrade the status without failing the check. A
+    # missing or expired quote is refreshed in the background for later polls;
+    # until a fetch has finished the price is unknown (ok null), not degraded.
+    global _btc_price_refresh
+    price = bitcoin_manager.get_btc_price_status()
+    if price['stale'] and (_btc_price_refresh is None or _btc_price_refresh.done()):
+        _btc_price_refresh = _health_probe_executor.submit(bitcoin_manager.get_btc_price)
+    checks['btc_price'] = {'ok': price['ok'], 'age_seconds': price['age_seconds']}
+    
+    if not healthy:
+        status = 'unhealthy'
+    elif price['ok'] is False:
+        status = 'degraded'
+    else:
+        status = 'healthy'
+    
+    body = orjson.dumps({
+        'status': status,
+        'checks': checks,
+        'timestamp': datetime.utcnow().isoformat(),
+        'bitcoin_network': app.config['BITCOIN_NETWORK'],
+        'btc_price_usd': price['price']
+    }, option=orjson.OPT_SORT_KEYS)
+    return body, hashlib.blake2b(body, digest_size=16).hexdigest(), healthy
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'bitcoin_network': app.config['BITCOIN_NETWORK'],
-        'btc_price_usd': bitcoin_manager.get_btc_price()
-    }), 200
+    body, etag, healthy = _render_health()
+    
+    if not healthy:
+        return app.response_class(body, status=503, mimetype='application/json')
+    
+    return etag_response(body, etag)
 
 # ============================================================================
 # Error Handlers
@@ -703,4 +1032,5 @@ def drop_db():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+    _address_pool_event.set()
     app.run(debug=True, host='0.0.0.0', port=5000)
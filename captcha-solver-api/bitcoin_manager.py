@@ -1,17 +1,87 @@
 import os
 import json
+import hashlib
+import threading
+import time
+import numpy as np
 import requests
-from bitcoinlib.keys import Key
-from bitcoinlib.wallets import Wallet, wallet_delete_if_exists
-from bitcoinlib.mnemonic import Mnemonic
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from coincurve import PrivateKey
 from datetime import datetime
 from config import Config
 
+def _create_http_session():
+    """Create a pooled keep-alive HTTP session with light retries"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# HTTP session shared by all managers so TCP/TLS connections are reused
+_http_session = _create_http_session()
+
+# Workers shared by all managers for concurrent blockchain.info requests
+MULTIADDR_CHUNK_SIZE = 50  # Addresses per multiaddr request (the endpoint's limit)
+_blockchain_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='blockchain')
+
+# BTC price shared by all managers in the process. The lock only guards the
+# cache fields; the HTTP fetch runs outside it by a single elected refresher.
+FALLBACK_BTC_PRICE = 45000.0
+_price_cache = {'value': None, 'quoted_at': 0.0, 'fetched_at': 0.0, 'refreshing': False, 'last_fetch_ok': None}
+_price_lock = threading.Lock()
+
+# Bech32 (BIP173) encoding for native segwit addresses
+_BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+_BECH32_HRP = {'testnet': 'tb', 'bitcoin': 'bc', 'mainnet': 'bc'}
+
+def _bech32_polymod(values):
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+def _bech32_encode(hrp, data):
+    """Encode 5-bit data with a bech32 checksum"""
+    expanded = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    polymod = _bech32_polymod(expanded + data + [0] * 6) ^ 1
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(_BECH32_CHARSET[d] for d in data + checksum)
+
+def _convert_bits(data, from_bits, to_bits):
+    """Regroup bytes into to_bits-wide words, padding the last one"""
+    acc = 0
+    bits = 0
+    result = []
+    maxv = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((acc >> bits) & maxv)
+    if bits:
+        result.append((acc << (to_bits - bits)) & maxv)
+    return result
+
+def _p2wpkh_address(public_key, network='testnet'):
+    """Build a native segwit (P2WPKH) address from a compressed public key"""
+    h160 = hashlib.new('ripemd160', hashlib.sha256(public_key).digest()).digest()
+    return _bech32_encode(_BECH32_HRP.get(network, 'tb'), [0] + _convert_bits(h160, 8, 5))
+
 class BitcoinWalletManager:
     """Manages Bitcoin wallet operations"""
     
     def __init__(self, network='testnet'):
         self.network = network
+        self._session = _http_session
         self.wallet_path = 'wallets'
         if not os.path.exists(self.wallet_path):
             os.makedirs(self.wallet_path)
@@ -19,10 +89,11 @@ class BitcoinWalletManager:
     def generate_address_for_user(self, user_id):
         """Generate a new Bitcoin address for a user"""
         try:
-            # Create a new private key
-            key = Key(network=self.network)
-            address = key.address()
-            public_key = key.public_hex
+            # Create a new private key on libsecp256k1's shared context
+            key = PrivateKey()
+            public_key_bytes = key.public_key.format(compressed=True)
+            address = _p2wpkh_address(public_key_bytes, self.network)
+            public_key = public_key_bytes.hex()
             
             # Store in wallet metadata for reference
             wallet_data = {
@@ -42,6 +113,10 @@ class BitcoinWalletManager:
             print(f"Error generating address: {str(e)}")
             return None
     
+    def generate_addresses_for_users(self, user_ids):
+        """Generate one address per user id (None for unassigned pool addresses) in a single pass"""
+        return [self.generate_address_for_user(user_id) for user_id in user_ids]
+    
     def get_address_balance(self, address):
         """Get balance for an address from blockchain"""
         try:
@@ -52,20 +127,60 @@ class BitcoinWalletManager:
                 # Use mainnet API
                 url = f'https://blockchain.info/q/addressbalance/{address}'
             
-            response = requests.get(url, timeout=10)
+            response = self._session.get(url, timeout=10)
             if response.status_code == 200:
                 # Balance is in satoshis
                 satoshis = int(response.text)
                 btc = satoshis / 100000000  # Convert satoshis to BTC
                 return {
                     'satoshis': satoshis,
-                    'btc': btc,
-                    'usd': btc * self.get_btc_price()
+                    'btc': btc
                 }
         except Exception as e:
             print(f"Error getting balance: {str(e)}")
         return None
     
+    def get_addresses_balances(self, addresses):
+        """Get balances for many addresses, one multiaddr request per chunk run concurrently
+        
+        Addresses whose chunk failed are missing from the result.
+        """
+        chunks = [addresses[i:i + MULTIADDR_CHUNK_SIZE] for i in range(0, len(addresses), MULTIADDR_CHUNK_SIZE)]
+        balances = {}
+        for chunk_balances in _blockchain_executor.map(self._get_multiaddr_balances, chunks):
+            balances.update(chunk_balances)
+        return balances
+    
+    def _get_multiaddr_balances(self, addresses):
+        """Get balances for up to MULTIADDR_CHUNK_SIZE addresses in a single request"""
+        try:
+            if self.network == 'testnet':
+                url = f'https://testnet.blockchain.info/multiaddr?active={"|".join(addresses)}'
+            else:
+                url = f'https://blockchain.info/multiaddr?active={"|".join(addresses)}'
+            
+            response = self._session.get(url, timeout=10)
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    a['address']: {
+                        'satoshis': a['final_balance'],
+                        'btc': a['final_balance'] / 100000000,
+                        'total_received': a['total_received'],
+                        'n_tx': a['n_tx']
+                    }
+                    for a in data.get('addresses', [])
+                }
+        except Exception as e:
+            print(f"Error getting balances: {str(e)}")
+        
+        return {}
+    
+    def get_addresses_transactions(self, addresses, limit=50):
+        """Get recent transactions for many addresses concurrently"""
+        results = _blockchain_executor.map(lambda address: self.get_address_transactions(address, limit), addresses)
+        return dict(zip(addresses, results))
+    
     def get_address_transactions(self, address, limit=50):
         """Get recent transactions for an address"""
         try:
@@ -74,25 +189,23 @@ class BitcoinWalletManager:
             else:
                 url = f'https://blockchain.info/address/{address}?format=json'
             
-            response = requests.get(url, timeout=10)
+            response = self._session.get(url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 transactions = []
                 
                 for tx in data.get('txs', [])[:limit]:
-                    tx_info = {
+                    # Calculate received amount from the outputs paying this address
+                    outputs = tx.get('out', [])
+                    values = np.fromiter((o['value'] for o in outputs), dtype=np.int64, count=len(outputs))
+                    to_address = np.fromiter((o.get('addr') == address for o in outputs), dtype=bool, count=len(outputs))
+                    
+                    transactions.append({
                         'txid': tx['hash'],
                         'confirmations': data.get('n_tx_unconfirmed', 0),
-                        'amount_btc': 0,
+                        'amount_btc': int(values[to_address].sum()) / 100000000,
                         'timestamp': tx['time']
-                    }
-                    
-                    # Calculate received amount
-                    for output in tx.get('out', []):
-                        if output.get('addr') == address:
-                            tx_info['amount_btc'] += output['value'] / 100000000
-                    
-                    transactions.append(tx_info)
+                    })
                 
                 return transactions
         except Exception as e:
@@ -108,13 +221,15 @@ class BitcoinWalletManager:
             else:
                 url = f'https://blockchain.info/tx/{txid}?format=json'
             
-            response = requests.get(url, timeout=10)
+            response = self._session.get(url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
+                outputs = data.get('out', [])
+                values = np.fromiter((o['value'] for o in outputs), dtype=np.int64, count=len(outputs))
                 return {
                     'confirmations': data.get('block_height', -1) if data.get('block_height') else 0,
                     'block_height': data.get('block_height'),
-                    'amount_btc': sum(o['value'] for o in data.get('out', [])) / 100000000,
+                    'amount_btc': int(values.sum()) / 100000000,
                     'timestamp': data.get('time')
                 }
         except Exception as e:
@@ -124,17 +239,68 @@ class BitcoinWalletManager:
     
     @staticmethod
     def get_btc_price():
-        """Get current BTC price in USD"""
+        """Get current BTC price in USD, cached for BTC_PRICE_CACHE_TTL seconds
+        
+        While one caller refreshes an expired price, the others get the stale
+        one. A failed fetch keeps the last quote and is not retried for a TTL
+        either. The fallback price is returned when no quote is available but
+        is never cached.
+        """
+        with _price_lock:
+            cached = _price_cache['value']
+            if cached is not None and _price_cache['refreshing']:
+                return cached
+            if _price_cache['last_fetch_ok'] is not None and time.monotonic() - _price_cache['fetched_at'] < Config.BTC_PRICE_CACHE_TTL:
+                return cached if cached is not None else FALLBACK_BTC_PRICE
+            if cached is not None:
+                _price_cache['refreshing'] = True
+        
+        price = None
         try:
-            response = requests.get(Config.BITCOIN_PRICE_API, timeout=10)
+            price = BitcoinWalletManager._fetch_btc_price()
+        finally:
+            with _price_lock:
+                if cached is not None:
+                    _price_cache['refreshing'] = False
+                _price_cache['last_fetch_ok'] = price is not None
+                _price_cache['fetched_at'] = time.monotonic()
+                if price is not None:
+                    _price_cache['value'] = price
+                    _price_cache['quoted_at'] = _price_cache['fetched_at']
+        
+        if price is not None:
+            return price
+        # Last known quote if there is one, otherwise the fallback
+        return cached if cached is not None else FALLBACK_BTC_PRICE
+    
+    @staticmethod
+    def get_btc_price_status():
+        """Outcome of the last BTC price fetch and the quote it left, without fetching
+        
+        ok is None until a fetch has finished; stale means get_btc_price would refresh.
+        """
+        with _price_lock:
+            value = _price_cache['value']
+            now = time.monotonic()
+            return {
+                'ok': _price_cache['last_fetch_ok'],
+                'stale': _price_cache['last_fetch_ok'] is None or now - _price_cache['fetched_at'] >= Config.BTC_PRICE_CACHE_TTL,
+                'price': value,
+                'age_seconds': round(now - _price_cache['quoted_at'], 1) if value is not None else None
+            }
+    
+    @staticmethod
+    def _fetch_btc_price():
+        """Fetch current BTC price in USD from the price API, or None if unavailable"""
+        try:
+            response = _http_session.get(Config.BITCOIN_PRICE_API, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 return float(data['bpi']['USD']['rate_float'])
         except Exception as e:
             print(f"Error getting BTC price: {str(e)}")
         
-        # Return fallback price
-        return 45000.0
+        return None
     
     @staticmethod
     def btc_to_usd(btc_amount):
@@ -150,10 +316,14 @@ class BitcoinWalletManager:
 class MockBitcoinWalletManager(BitcoinWalletManager):
     """Mock Bitcoin wallet manager for testing/development"""
     
-    def __init__(self, network='testnet'):
+    def __init__(self, network='testnet', max_addresses=10000):
         super().__init__(network)
-        self.mock_balances = {}
-        self.mock_transactions = {}
+        # Only addresses that received a mock transaction are stored; the least
+        # recently used one is evicted once more than max_addresses are tracked
+        self.max_addresses = max_addresses
+        self.mock_balances = Counter()
+        self.mock_transactions = OrderedDict()
+        self._mock_lock = threading.Lock()
     
     def generate_address_for_user(self, user_id):
         """Generate a mock Bitcoin address"""
@@ -161,9 +331,6 @@ class MockBitcoinWalletManager(BitcoinWalletManager):
         # Generate a realistic-looking testnet address
         address = f"tb1{''.join(secrets.choice('0123456789abcdefghijklmnopqrstuvwxyz') for _ in range(52))}"
         
-        self.mock_balances[address] = 0
-        self.mock_transactions[address] = []
-        
         return {
             'address': address,
             'public_key': f"0{'0' * 65}",  # Mock public key
@@ -172,39 +339,59 @@ class MockBitcoinWalletManager(BitcoinWalletManager):
     
     def get_address_balance(self, address):
         """Get mock balance for an address"""
-        satoshis = self.mock_balances.get(address, 0)
+        satoshis = self.mock_balances[address]
         btc = satoshis / 100000000
         
         return {
             'satoshis': satoshis,
-            'btc': btc,
-            'usd': btc * self.get_btc_price()
+            'btc': btc
         }
     
+    def get_addresses_balances(self, addresses):
+        """Get mock balances for many addresses (mock funds are never spent)"""
+        balances = {}
+        with self._mock_lock:
+            for address in addresses:
+                satoshis = self.mock_balances[address]
+                balances[address] = {
+                    'satoshis': satoshis,
+                    'btc': satoshis / 100000000,
+                    'total_received': satoshis,
+                    'n_tx': len(self.mock_transactions.get(address, []))
+                }
+        return balances
+    
     def add_mock_transaction(self, address, txid, amount_btc):
         """Add a mock transaction (for testing)"""
-        if address not in self.mock_transactions:
-            self.mock_transactions[address] = []
-        
-        self.mock_transactions[address].append({
-            'txid': txid,
-            'confirmations': 0,
-            'amount_btc': amount_btc,
-            'timestamp': datetime.utcnow().timestamp()
-        })
-        
-        # Update balance
-        satoshis = int(amount_btc * 100000000)
-        self.mock_balances[address] = self.mock_balances.get(address, 0) + satoshis
+        with self._mock_lock:
+            transactions = self.mock_transactions.get(address)
+            if transactions is None:
+                transactions = self.mock_transactions[address] = []
+                if len(self.mock_transactions) > self.max_addresses:
+                    evicted, _ = self.mock_transactions.popitem(last=False)
+                    del self.mock_balances[evicted]
+            else:
+                self.mock_transactions.move_to_end(address)
+            
+            transactions.append({
+                'txid': txid,
+                'confirmations': 0,
+                'amount_btc': amount_btc,
+                'timestamp': datetime.utcnow().timestamp()
+            })
+            
+            # Update balance
+            self.mock_balances[address] += int(amount_btc * 100000000)
     
     def get_address_transactions(self, address, limit=50):
         """Get mock transactions"""
-        return self.mock_transactions.get(address, [])[:limit]
+        with self._mock_lock:
+            return self.mock_transactions.get(address, [])[:limit]
     
     def confirm_mock_transaction(self, address, txid, confirmations=2):
         """Confirm a mock transaction (for testing)"""
-        transactions = self.mock_transactions.get(address, [])
-        for tx in transactions:
-            if tx['txid'] == txid:
-                tx['confirmations'] = confirmations
-                break
+        with self._mock_lock:
+            for tx in self.mock_transactions.get(address, []):
+                if tx['txid'] == txid:
+                    tx['confirmations'] = confirmations
+                    break
@@ -11,17 +11,40 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=30)
     
+    # Password hashing
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))  # bcrypt work factor (cost doubles per round)
+    
     # CAPTCHA Settings
     CAPTCHA_PRICE = 0.001  # $0.001 per captcha
     MIN_DEPOSIT = 15.0  # $15 minimum deposit
     
+    # Inference batching (off until a real model backs solve_captcha_batch;
+    # batching the simulated solver only adds queue wait to every solve)
+    INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', 'false').lower() == 'true'
+    INFERENCE_MAX_BATCH = 16  # Max CAPTCHA solves per forward pass
+    INFERENCE_MAX_WAIT_MS = 5  # Max time a request waits for others to join its batch
+    INFERENCE_TIMEOUT = 30  # Seconds a solve request waits for its batch result
+    
     # Bitcoin Settings
     BITCOIN_NETWORK = 'testnet'  # Use 'testnet' for testing, 'mainnet' for production
     CONFIRMATION_THRESHOLD = 2  # Number of confirmations required
     BITCOIN_PRICE_API = 'https://api.coindesk.com/v1/bpi/currentprice/BTC.json'
+    BTC_PRICE_CACHE_TTL = 30  # Seconds a fetched BTC price is reused
+    ADDRESS_POOL_SIZE = 1000  # Unassigned deposit addresses kept ready for new users
+    ADDRESS_POOL_REFILL_INTERVAL = 60  # Seconds between pool top-ups when no address was claimed
+    DEPOSIT_POLL_INTERVAL = 60  # Seconds between bulk checks of all deposit addresses
     
     # API Settings
     API_RATE_LIMIT = "100 per hour"
+    LAST_USED_FLUSH_INTERVAL = 30  # Seconds between batched API token last_used writes
+    LAST_USED_FLUSH_SIZE = 100  # Flush early once this many tokens are pending
+    HEALTH_CACHE_SECONDS = 5  # Health payload (and its ETag) is reused for this long
+    HEALTH_PROBE_TIMEOUT = 0.25  # Seconds each health check dependency probe may take
+    API_DOCS_CACHE_SECONDS = 3600  # Rendered API docs are reused for this long
+    
+    # Response cache (SimpleCache is per-process; use RedisCache to share across workers)
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
     
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -38,6 +61,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
+    BCRYPT_ROUNDS = 4  # Minimum cost; keeps test logins fast
+    ADDRESS_POOL_SIZE = 10
 
 config = {
     'development': DevelopmentConfig,
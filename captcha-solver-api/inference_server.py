@@ -0,0 +1,59 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """Collects concurrent inference requests and runs them as one batch"""
+
+    def __init__(self, predict_batch, max_batch=16, max_wait_ms=5):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queue an item for inference, returning a Future for its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Worker loop running one forward pass per collected batch"""
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _ in batch]
+
+            try:
+                results = self.predict_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            if len(results) != len(batch):
+                error = RuntimeError(f'predict_batch returned {len(results)} results for {len(batch)} items')
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -1,5 +1,8 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from dataclasses import dataclass, fields
 from datetime import datetime
+from typing import Optional
 import uuid
 import bcrypt
 
@@ -9,10 +12,10 @@ class User(db.Model):
     """User model"""
     __tablename__ = 'users'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
-    password_hash = db.Column(db.String(255), nullable=False)
+    password_hash = db.Column(db.LargeBinary(60), nullable=False)  # Raw bcrypt hash bytes
     balance = db.Column(db.Float, default=0.0)
     wallet_address = db.Column(db.String(255), unique=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -26,11 +29,16 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        rounds = current_app.config.get('BCRYPT_ROUNDS', 12)
+        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds))
     
     def check_password(self, password):
         """Check password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        password_hash = self.password_hash
+        # Rows written before the column held raw bytes come back as str
+        if isinstance(password_hash, str):
+            password_hash = password_hash.encode('utf-8')
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash)
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -48,8 +56,8 @@ class APIToken(db.Model):
     """API Token model"""
     __tablename__ = 'api_tokens'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False, index=True)
     token = db.Column(db.String(128), unique=True, nullable=False, index=True)
     name = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -70,9 +78,13 @@ class APIToken(db.Model):
 class Transaction(db.Model):
     """Bitcoin transaction model"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_tx_user_status', 'user_id', 'status'),
+        db.Index('ix_tx_user_received', 'user_id', 'received_at'),  # Transaction list, newest first
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
     txid = db.Column(db.String(255), unique=True, nullable=False, index=True)
     amount_btc = db.Column(db.Float, nullable=False)
     amount_usd = db.Column(db.Float, nullable=False)
@@ -99,16 +111,21 @@ class Transaction(db.Model):
 class Deposit(db.Model):
     """User deposit aggregation model"""
     __tablename__ = 'deposits'
+    __table_args__ = (
+        db.Index('ix_deposit_user_status', 'user_id', 'status'),  # Current pending deposit lookup
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
     total_btc = db.Column(db.Float, default=0.0)
     total_usd = db.Column(db.Float, default=0.0)
     credited_amount = db.Column(db.Float, default=0.0)  # Amount credited to balance
     status = db.Column(db.String(20), default='pending')  # pending, partial, credited
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    transaction_ids = db.Column(db.Text, default='')  # Comma-separated transaction IDs
+    
+    # Relationships
+    transactions = db.relationship('Transaction', secondary='deposit_transactions', lazy=True, backref='deposits')
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -122,13 +139,26 @@ class Deposit(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
+class DepositTransaction(db.Model):
+    """Transactions counted towards a deposit aggregation"""
+    __tablename__ = 'deposit_transactions'
+    
+    deposit_id = db.Column(db.Uuid, db.ForeignKey('deposits.id'), primary_key=True)
+    transaction_id = db.Column(db.Uuid, db.ForeignKey('transactions.id'), primary_key=True, index=True)  # Reverse lookup; deposit_id is covered by the primary key
+
 class CAPTCHASolve(db.Model):
     """CAPTCHA solve record model"""
     __tablename__ = 'captcha_solves'
+    __table_args__ = (
+        # Covers the dashboard aggregates so they can be answered from the index alone
+        db.Index('ix_captcha_user_status', 'user_id', 'status', 'cost', 'inference_time_ms'),
+        # History keyset pagination (ORDER BY created_at DESC, id DESC walks it backwards)
+        db.Index('ix_captcha_user_created', 'user_id', 'created_at', 'id'),
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
-    api_key = db.Column(db.String(128), db.ForeignKey('api_tokens.id'), nullable=False)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
+    api_key = db.Column(db.Uuid, db.ForeignKey('api_tokens.id'), nullable=False)
     website_url = db.Column(db.String(500), nullable=True)
     recaptcha_key = db.Column(db.String(255), nullable=True)
     status = db.Column(db.String(20), default='pending')  # pending, success, failed
@@ -139,25 +169,54 @@ class CAPTCHASolve(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     
+    def to_dict(self):
+        """Convert to dictionary (the fields of CAPTCHASolveView)"""
+        return CAPTCHASolveView.from_solve(self).to_dict()
+
+@dataclass
+class CAPTCHASolveView:
+    """Lightweight CAPTCHASolve row for history listings and the source of to_dict's fields
+
+    Built straight from selected columns and serialized by orjson, which writes
+    UUIDs and datetimes natively, so no ORM instance or dict is built per row.
+    orjson writes dataclass fields in declaration order and ignores
+    OPT_SORT_KEYS, so fields are declared sorted to match every other object.
+    """
+    __slots__ = ('completed_at', 'cost', 'created_at', 'id', 'inference_time_ms',
+                 'recaptcha_key', 'status', 'website_url')
+    completed_at: Optional[datetime]
+    cost: float
+    created_at: datetime
+    id: uuid.UUID
+    inference_time_ms: Optional[float]
+    recaptcha_key: Optional[str]
+    status: str
+    website_url: Optional[str]
+    
+    @classmethod
+    def columns(cls):
+        """CAPTCHASolve columns to select, in field order"""
+        return [getattr(CAPTCHASolve, field.name) for field in fields(cls)]
+    
+    @classmethod
+    def from_solve(cls, solve):
+        """View of a loaded CAPTCHASolve"""
+        return cls(*(getattr(solve, field.name) for field in fields(cls)))
+    
     def to_dict(self):
         """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'website_url': self.website_url,
-            'recaptcha_key': self.recaptcha_key,
-            'status': self.status,
-            'cost': self.cost,
-            'inference_time_ms': self.inference_time_ms,
-            'created_at': self.created_at.isoformat(),
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
-        }
+        data = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            data[field.name] = value.isoformat() if isinstance(value, datetime) else value
+        return data
 
 class BitcoinAddress(db.Model):
     """Generated Bitcoin addresses for users"""
     __tablename__ = 'bitcoin_addresses'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True, unique=True)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=True, index=True, unique=True)  # NULL while pooled
     address = db.Column(db.String(255), unique=True, nullable=False, index=True)
     public_key = db.Column(db.String(255), nullable=True)
     private_key_encrypted = db.Column(db.Text, nullable=True)  # Store encrypted for security
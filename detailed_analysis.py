@@ -5,9 +5,21 @@ Comprehensive Performance Analysis Report for reCAPTCHAv2 Solver
 
 import pandas as pd
 from pathlib import Path
-import json
-from collections import defaultdict
+import orjson
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# The timestamp column is never used, so only type and category are parsed
+LOG_COLUMNS = ['type', 'category']
+LOG_DTYPES = {'type': 'category', 'category': 'category'}
+
+def read_session_log(csv_file):
+    """Read a session log as categorical columns, or None if it cannot be parsed"""
+    try:
+        return pd.read_csv(csv_file, header=None, names=['timestamp'] + LOG_COLUMNS,
+                           usecols=LOG_COLUMNS, dtype=LOG_DTYPES, engine='c')
+    except Exception as e:
+        return None
 
 class DetailedAnalysis:
     def __init__(self):
@@ -21,51 +33,37 @@ class DetailedAnalysis:
         print("="*90)
         print(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         
+        # Read every session's logs, then aggregate them all at once
+        log_files = sorted(self.sessions_path.glob("*/*.csv"))
+        with ProcessPoolExecutor() as executor:
+            logs = list(executor.map(read_session_log, log_files, chunksize=16))
+        frames = [(path.parent.name, df) for path, df in zip(log_files, logs) if df is not None]
+        
+        if frames:
+            full = pd.concat([df for _, df in frames], keys=[name for name, _ in frames], names=['session', 'row'])
+        else:
+            full = pd.DataFrame(columns=LOG_COLUMNS, index=pd.MultiIndex.from_arrays([[], []], names=['session', 'row']))
+        
+        # Per-file categories differ, so re-encode once over all sessions
+        for column in LOG_COLUMNS:
+            full[column] = full[column].astype(pd.CategoricalDtype(full[column].dropna().unique()))
+        
         # Aggregate statistics
-        challenge_types = defaultdict(int)
-        challenge_categories = defaultdict(int)
-        total_challenges = 0
-        session_details = []
+        total_challenges = len(full)
+        challenge_types = {k: int(v) for k, v in full['type'].value_counts(sort=False, dropna=False).items()}
+        challenge_categories = {k: int(v) for k, v in full['category'].value_counts(sort=False, dropna=False).items()}
+        session_totals = full.groupby(level='session', sort=False).size()
+        session_types = full.groupby([pd.Grouper(level='session'), 'type'], sort=False, observed=True, dropna=False).size()
+        session_cats = full.groupby([pd.Grouper(level='session'), 'category'], sort=False, observed=True, dropna=False).size()
         
-        # Process each session
-        for session_dir in sorted(self.sessions_path.glob("*/")):
-            if not session_dir.is_dir():
-                continue
-            
-            session_name = session_dir.name
-            csv_files = list(session_dir.glob("*.csv"))
-            
-            if not csv_files:
-                continue
-            
-            session_total = 0
-            session_challenges = defaultdict(int)
-            session_categories = defaultdict(int)
-            
-            for csv_file in sorted(csv_files):
-                try:
-                    df = pd.read_csv(csv_file, header=None, names=['timestamp', 'type', 'category'])
-                    
-                    for _, row in df.iterrows():
-                        session_total += 1
-                        challenge_type = row['type']
-                        category = row['category']
-                        
-                        challenge_types[challenge_type] += 1
-                        challenge_categories[category] += 1
-                        session_challenges[challenge_type] += 1
-                        session_categories[category] += 1
-                        total_challenges += 1
-                
-                except Exception as e:
-                    pass
-            
+        session_details = []
+        for session_name, session_total in session_totals.items():
             if session_total > 0:
                 session_details.append({
                     'name': session_name,
-                    'total': session_total,
-                    'types': dict(session_challenges),
-                    'categories': dict(session_categories)
+                    'total': int(session_total),
+                    'types': {k: int(v) for k, v in session_types.xs(session_name, level='session').items()},
+                    'categories': {k: int(v) for k, v in session_cats.xs(session_name, level='session').items()}
                 })
         
         # Print session summary
@@ -116,7 +114,7 @@ class DetailedAnalysis:
         print(f"Unique Challenge Types: {len(challenge_types)}")
         print(f"Unique Object Categories: {len(challenge_categories)}")
         print(f"Number of Sessions: {len(session_details)}")
-        print(f"Average Challenges per Session: {total_challenges / len(session_details):.1f}")
+        print(f"Average Challenges per Session: {total_challenges / len(session_details) if session_details else 0:.1f}")
         print()
         print(f"Success Rate: 100% (All logged challenges were successfully solved)")
         print("="*90)
@@ -141,8 +139,7 @@ class DetailedAnalysis:
         
         # Save detailed report
         report_path = Path("/workspaces/reCAPTCHAv2-solver/detailed_analysis_report.json")
-        with open(report_path, 'w') as f:
-            json.dump(detailed_report, f, indent=2)
+        report_path.write_bytes(orjson.dumps(detailed_report, option=orjson.OPT_INDENT_2))
         
         print(f"\nDetailed JSON report saved to: {report_path}")
         
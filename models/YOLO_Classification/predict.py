@@ -7,6 +7,7 @@ from shap import KernelExplainer, force_plot
 import numpy as np
 import cv2
 import os
+from models.torch_compile import compile_model
 
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -14,7 +15,20 @@ script_dir = os.path.dirname(os.path.realpath(__file__))
 # Construct the path to the best.pt file
 model_path = os.path.join(script_dir, 'train4', 'weights', 'best.pt')
 
-model = YOLO(model_path)
+# Prefer the TensorRT engine built by models/export_tensorrt.py if it exists
+engine_path = os.path.join(script_dir, 'train4', 'weights', 'best.engine')
+int8_engine_path = os.path.join(script_dir, 'train4', 'weights', 'best_int8.engine')
+
+# The INT8 engine is opt-in; the FP16 engine remains the default
+if os.getenv('CAPTCHA_INT8') == '1' and os.path.exists(int8_engine_path):
+    model = YOLO(int8_engine_path, task='classify')
+elif os.path.exists(engine_path):
+    model = YOLO(engine_path, task='classify')
+else:
+    model = YOLO(model_path)
+
+# Without a TensorRT engine, fall back to torch.compile
+compile_model(model, torch.zeros(1, 3, 128, 128), os.path.join(script_dir, '.inductor_cache'))
 
 def predict_tile(tile_path):
     # Load the image
@@ -4,6 +4,8 @@ from PIL import Image
 import torch
 from torchvision import transforms
 import cv2
+import os
+from models.torch_compile import compile_model
 
 CLASSES = ["bicycle", "bridge", "bus", "car", "chimney", "crosswalk", "hydrant", "motorcycle", "other", "palm", "stairs", "traffic"]
 """{0: 'person', 1: 'bicycle', 2: 'car', 3: 'motorcycle', 4: 'airplane', 5: 'bus',
@@ -22,8 +24,15 @@ CLASSES = ["bicycle", "bridge", "bus", "car", "chimney", "crosswalk", "hydrant",
                               77: 'teddy bear', 78: 'hair drier', 79: 'toothbrush'}
 """
 MAPPING = [(1, 0), (5, 2), (2, 3), (10, 6), (3,7), (9, 11)] # mapping from COCO to captcha classes
-# Load a pretrained YOLOv8n model
-model = YOLO('yolov8n-seg.pt')
+# Load a pretrained YOLOv8n model, preferring the TensorRT engine built by models/export_tensorrt.py
+if os.path.exists('yolov8n-seg.engine'):
+  model = YOLO('yolov8n-seg.engine', task='segment')
+else:
+  model = YOLO('yolov8n-seg.pt')
+
+# Without a TensorRT engine, fall back to torch.compile
+compile_model(model, np.zeros((320, 320, 3), dtype=np.uint8),
+              os.path.join(os.path.dirname(os.path.realpath(__file__)), '.inductor_cache'), imgsz=320, conf=0.5)
 
 
 
@@ -0,0 +1,151 @@
+from ultralytics import YOLO
+from PIL import Image
+from torchvision import transforms
+import torch
+import argparse
+import glob
+import json
+import os
+
+"""
+This script exports the YOLO classification and segmentation models to TensorRT engines.
+The engines are written next to the original weights (best.engine / yolov8n-seg.engine)
+and are picked up automatically by models/YOLO_Classification/predict.py and
+models/YOLO_Segment/predict.py, which fall back to the PyTorch weights if no engine exists.
+Engines are tied to the GPU and TensorRT version they were built with, so rerun this
+script after changing either. Requires an NVIDIA GPU with TensorRT installed.
+
+With --int8 the classification model is additionally built as an INT8 engine
+(best_int8.engine), calibrated on CAPTCHA tiles found under --calib-dir. The INT8 engine
+is only used when CAPTCHA_INT8=1 is set; the FP16 engine stays the default.
+"""
+
+# Get the directory of the current script
+script_dir = os.path.dirname(os.path.realpath(__file__))
+repo_dir = os.path.dirname(script_dir)
+
+# Weights and the input size each predictor feeds the model
+CLASSIFICATION_WEIGHTS = os.path.join(script_dir, 'YOLO_Classification', 'train4', 'weights', 'best.pt')
+CLASSIFICATION_INT8_ENGINE = os.path.join(script_dir, 'YOLO_Classification', 'train4', 'weights', 'best_int8.engine')
+CLASSIFICATION_IMGSZ = 128  # predict_tile resizes tiles to 128x128
+SEGMENT_WEIGHTS = os.path.join(repo_dir, 'yolov8n-seg.pt')
+SEGMENT_IMGSZ = 320  # predict() runs the segmenter at imgsz=320
+
+
+def export_engine(weights, imgsz, half=True, device=0):
+    # Ultralytics exports to ONNX, builds the engine and stores it next to the weights
+    model = YOLO(weights)
+    engine_path = model.export(format='engine', imgsz=imgsz, half=half, device=device)
+    print(f'Exported {weights} -> {engine_path}')
+    return engine_path
+
+
+def find_calibration_tiles(calib_dir, max_tiles=500):
+    # Collect CAPTCHA tile images recursively
+    paths = []
+    for ext in ('png', 'jpg', 'jpeg'):
+        paths.extend(glob.glob(os.path.join(calib_dir, '**', f'*.{ext}'), recursive=True))
+    return sorted(paths)[:max_tiles]
+
+
+def make_calibrator(kind, tile_paths, imgsz, input_shape, cache_file):
+    import tensorrt as trt
+
+    base = trt.IInt8EntropyCalibrator2 if kind == 'entropy' else trt.IInt8MinMaxCalibrator
+
+    class CaptchaTileCalibrator(base):
+        """Feeds CAPTCHA tiles, preprocessed like predict_tile, to the TensorRT calibrator"""
+
+        def __init__(self):
+            base.__init__(self)
+            self.batch_size = input_shape[0]
+            self.index = 0
+            # Device buffer reused for every calibration batch
+            self.device_input = torch.empty(tuple(input_shape), dtype=torch.float32, device='cuda')
+
+        def get_batch_size(self):
+            return self.batch_size
+
+        def get_batch(self, names):
+            if self.index + self.batch_size > len(tile_paths):
+                return None
+
+            batch = []
+            for path in tile_paths[self.index:self.index + self.batch_size]:
+                tile = Image.open(path).convert("RGB").resize((imgsz, imgsz))
+                batch.append(transforms.ToTensor()(tile))
+            self.index += self.batch_size
+
+            self.device_input.copy_(torch.stack(batch))
+            return [int(self.device_input.data_ptr())]
+
+        def read_calibration_cache(self):
+            if os.path.exists(cache_file):
+                with open(cache_file, 'rb') as f:
+                    return f.read()
+            return None
+
+        def write_calibration_cache(self, cache):
+            with open(cache_file, 'wb') as f:
+                f.write(cache)
+
+    return CaptchaTileCalibrator()
+
+
+def export_int8_engine(weights, imgsz, engine_path, calib_dir, calibrator='entropy', device=0, workspace=4):
+    import onnx
+    import tensorrt as trt
+
+    tile_paths = find_calibration_tiles(calib_dir)
+    if not tile_paths:
+        raise FileNotFoundError(f'No calibration tiles found in {calib_dir}')
+
+    # Export to ONNX first, then build the INT8 engine ourselves so we can attach a calibrator
+    onnx_path = YOLO(weights).export(format='onnx', imgsz=imgsz, device=device)
+
+    logger = trt.Logger(trt.Logger.INFO)
+    builder = trt.Builder(logger)
+    network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+    parser = trt.OnnxParser(network, logger)
+    if not parser.parse_from_file(onnx_path):
+        raise RuntimeError(f'Failed to parse {onnx_path}: {[parser.get_error(i) for i in range(parser.num_errors)]}')
+
+    config = builder.create_builder_config()
+    config.set_memory_pool_limit(trt.MemoryPoolType.WORKSPACE, workspace << 30)
+    config.set_flag(trt.BuilderFlag.INT8)
+    config.set_flag(trt.BuilderFlag.FP16)  # layers without an INT8 kernel fall back to FP16
+    config.int8_calibrator = make_calibrator(
+        calibrator, tile_paths, imgsz, network.get_input(0).shape,
+        os.path.splitext(engine_path)[0] + f'.{calibrator}.cache'
+    )
+
+    serialized = builder.build_serialized_network(network, config)
+    if serialized is None:
+        raise RuntimeError('TensorRT INT8 engine build failed')
+
+    # Prefix the engine with the Ultralytics metadata header so YOLO() can load it directly
+    metadata = json.dumps({p.key: p.value for p in onnx.load(onnx_path).metadata_props})
+    with open(engine_path, 'wb') as f:
+        f.write(len(metadata).to_bytes(4, byteorder='little', signed=True))
+        f.write(metadata.encode())
+        f.write(serialized)
+
+    print(f'Exported {weights} -> {engine_path} (INT8, {calibrator} calibration on {len(tile_paths)} tiles)')
+    return engine_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export YOLO models to TensorRT engines')
+    parser.add_argument('--fp32', action='store_true', help='build FP32 engines instead of FP16')
+    parser.add_argument('--device', default=0, help='CUDA device to build the engines on')
+    parser.add_argument('--int8', action='store_true', help='also build an INT8 classification engine')
+    parser.add_argument('--calib-dir', default=os.path.join(repo_dir, 'Sessions'), help='directory with CAPTCHA tiles for INT8 calibration')
+    parser.add_argument('--calibrator', choices=['entropy', 'minmax'], default='entropy', help='INT8 calibration algorithm')
+    args = parser.parse_args()
+
+    export_engine(CLASSIFICATION_WEIGHTS, CLASSIFICATION_IMGSZ, half=not args.fp32, device=args.device)
+    export_engine(SEGMENT_WEIGHTS, SEGMENT_IMGSZ, half=not args.fp32, device=args.device)
+
+    if args.int8:
+        export_int8_engine(CLASSIFICATION_WEIGHTS, CLASSIFICATION_IMGSZ, CLASSIFICATION_INT8_ENGINE,
+                           args.calib_dir, calibrator=args.calibrator, device=args.device)
@@ -0,0 +1,33 @@
+import torch
+import os
+
+"""
+torch.compile fallback shared by the YOLO predict modules. When a predictor is
+loaded from PyTorch weights (no TensorRT engine from models/export_tensorrt.py),
+its network is swapped for a torch.compile'd one. Disable with CAPTCHA_TORCH_COMPILE=0.
+"""
+
+
+def compile_model(model, warmup_input, cache_dir, **predict_kwargs):
+    # TensorRT engines and exported formats are not nn.Modules and are already optimized
+    if not isinstance(model.model, torch.nn.Module) or not hasattr(torch, 'compile'):
+        return
+    if os.getenv('CAPTCHA_TORCH_COMPILE', '1') != '1':
+        return
+
+    # Keep the Inductor cache between runs so only the first start pays for compilation
+    os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', cache_dir)
+
+    # Run once so Ultralytics sets up its predictor, then swap in the compiled network
+    model.predict(warmup_input, verbose=False, **predict_kwargs)
+    backend = model.predictor.model
+    eager_model = backend.model
+
+    try:
+        backend.model = torch.compile(eager_model, mode='reduce-overhead')
+        # Warmup call triggers tracing and codegen so real inputs hit the compiled path
+        with torch.no_grad():
+            model.predict(warmup_input, verbose=False, **predict_kwargs)
+    except Exception as e:
+        print(f"torch.compile failed, using eager model: {e}")
+        backend.model = eager_model